@@ -1,359 +1,604 @@
-# app.py
-from flask import Flask, request, render_template_string
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import io
-import base64
-import matplotlib.pyplot as plt
-
-app = Flask(__name__)
-portfolio = []  # simple in-memory portfolio
-
-# Predefined stock list (you can add/remove tickers)
-STOCK_LIST = ["RELIANCE.NS","TARIL.NS","TIL.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS", "ITC.NS", "RELIANCE.NS", "SBIN.NS", "BAJFINANCE.NS", "LT.NS"]
-
-# ----------------- Helpers -----------------
-def get_historical_prices(symbol, days=180):
-    """Download daily history (reliable)"""
-    try:
-        df = yf.download(symbol, period=f"{days}d", interval="1d", progress=False)
-        if df.empty:
-            return None
-        df = df[['Open','High','Low','Close','Volume']].rename(columns=str.lower)
-        df.index = pd.to_datetime(df.index)
-        return df
-    except Exception:
-        return None
-
-def get_latest_price(symbol):
-    """Try to fetch the most recent market price robustly"""
-    try:
-        t = yf.Ticker(symbol)
-        # fast_info is usually fastest
-        if hasattr(t, "fast_info") and isinstance(t.fast_info, dict):
-            last = t.fast_info.get("last_price") or t.fast_info.get("lastVolume")  # fallback
-            if last:
-                return float(last)
-        # primary fallback: regularMarketPrice from info
-        info = t.info if hasattr(t, "info") else {}
-        rmp = info.get("regularMarketPrice") or info.get("previousClose")
-        if rmp is not None:
-            return float(rmp)
-        # final fallback: recent close from history
-        hist = t.history(period="5d")
-        if not hist.empty:
-            return float(hist['Close'].dropna().iloc[-1])
-    except Exception:
-        pass
-    return None
-
-def choose_benchmark(symbol):
-    """Pick ^NSEI for Indian (.NS) tickers, otherwise ^GSPC (S&P500)"""
-    s = symbol.upper()
-    if s.endswith(".NS") or s.endswith(".BSE") or s.endswith(".BO") or s.endswith(".BE"):
-        return "^NSEI"
-    return "^GSPC"
-
-def compute_beta(stock_df, market_df):
-    try:
-        df = pd.DataFrame({
-            "stock": stock_df["close"].pct_change(),
-            "market": market_df["close"].pct_change()
-        }).dropna()
-        if df.shape[0] < 10:
-            return None
-        cov = np.cov(df["stock"], df["market"])[0,1]
-        var_market = np.var(df["market"])
-        return float(cov / var_market) if var_market != 0 else None
-    except Exception:
-        return None
-
-def format_large_number(value, currency_symbol=""):
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return "N/A"
-    try:
-        v = float(value)
-    except Exception:
-        return str(value)
-    # nice units
-    if abs(v) >= 1e12:
-        return f"{currency_symbol}{v/1e12:,.2f} T"
-    if abs(v) >= 1e9:
-        return f"{currency_symbol}{v/1e9:,.2f} B"
-    if abs(v) >= 1e6:
-        return f"{currency_symbol}{v/1e6:,.2f} M"
-    return f"{currency_symbol}{v:,.2f}"
-
-def get_company_financials(symbol):
-    """Return (latest_net_income, list_of_last4_quarters [(period_str, value)], market_cap, promoter_pct, currency)"""
-    try:
-        t = yf.Ticker(symbol)
-        info = t.info if hasattr(t, "info") else {}
-        currency = info.get("currency", "")
-        currency_symbol = "₹" if currency == "INR" else ("$" if currency == "USD" else "")
-        # annual net income (from financials)
-        net_income = None
-        try:
-            fin = t.financials
-            if not fin.empty and "Net Income" in fin.index:
-                net_income = fin.loc["Net Income"].iloc[0]
-        except Exception:
-            net_income = None
-        # quarterly: extract last 4 quarters net income
-        quarterly_profits = []
-        try:
-            qfin = t.quarterly_financials
-            if not qfin.empty and "Net Income" in qfin.index:
-                s = qfin.loc["Net Income"]
-                # take first 4 columns (yfinance usually orders most recent first)
-                items = s.iloc[:4]
-                for idx, val in items.items():
-                    # idx may be Timestamp or str
-                    try:
-                        date_str = pd.to_datetime(idx).strftime("%b %Y")
-                    except Exception:
-                        date_str = str(idx)
-                    quarterly_profits.append((date_str, val))
-        except Exception:
-            pass
-        market_cap = info.get("marketCap")
-        promoter_holding = info.get("heldPercentInsiders", None)
-        return net_income, quarterly_profits, market_cap, promoter_holding, currency_symbol
-    except Exception:
-        return None, [], None, None, ""
-
-# ---------------- HTML Template ----------------
-html_template = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Portfolio & Stock Dashboard</title>
-    <meta name="viewport" content="width=device-width,initial-scale=1">
-    <style>
-        :root{--blue:#007bff;--dark:#222}
-        body{font-family:Inter,Arial,Helvetica,sans-serif;background:#f5f7fb;margin:0;padding:20px;display:flex;flex-direction:column;align-items:center}
-        .wrap{width:100%;max-width:1100px}
-        header{display:flex;justify-content:space-between;align-items:center;margin-bottom:16px}
-        h1{margin:0;color:var(--dark)}
-        form{display:flex;gap:8px;flex-wrap:wrap}
-        select,input,button{padding:10px;border-radius:8px;border:1px solid #d6dbe8;font-size:14px}
-        button{background:var(--blue);color:#fff;border:none;cursor:pointer}
-        .card{background:#fff;border-radius:12px;padding:18px;box-shadow:0 6px 18px rgba(30,40,60,0.06);margin-bottom:16px}
-        .grid{display:grid;grid-template-columns:repeat(3,1fr);gap:12px}
-        .metric{background:#fbfdff;padding:12px;border-radius:8px;border:1px solid #eef3fb}
-        .metric strong{display:block;font-size:13px;color:#6b7280}
-        .metric .val{font-size:18px;margin-top:6px;color:#111}
-        table{width:100%;border-collapse:collapse;margin-top:12px}
-        th,td{padding:10px;border-bottom:1px solid #eef1f6;text-align:center}
-        th{background:linear-gradient(90deg,var(--blue),#0056b3);color:#fff}
-        .green{color:green;font-weight:600}
-        .red{color:red;font-weight:600}
-        img{max-width:100%;border-radius:8px;margin-top:12px}
-        @media (max-width:800px){
-            .grid{grid-template-columns:repeat(1,1fr)}
-        }
-    </style>
-</head>
-<body>
-<div class="wrap">
-  <header>
-    <h1>Portfolio & Stock Dashboard</h1>
-  </header>
-
-  <div class="card">
-    <form method="POST" style="align-items:center;">
-      <select name="symbol">
-        {% for s in stock_list %}
-          <option value="{{s}}" {% if result and result.symbol==s %}selected{% endif %}>{{s}}</option>
-        {% endfor %}
-      </select>
-      <input type="text" name="custom" placeholder="Or type custom ticker (e.g. AAPL)" />
-      <input type="number" name="quantity" placeholder="Qty (optional)" min="1" />
-      <input type="number" step="0.01" name="price" placeholder="Buy Price (optional)" />
-      <button type="submit">Analyze / Add</button>
-    </form>
-  </div>
-
-  {% if result %}
-  <div class="card">
-    {% if result.error %}
-      <div style="color:red;font-weight:600">{{ result.error }}</div>
-    {% else %}
-      <div style="display:flex;justify-content:space-between;align-items:center;gap:16px;flex-wrap:wrap">
-        <div>
-          <h2 style="margin:0">{{ result.symbol }}</h2>
-          <div style="margin-top:6px;color:#6b7280">{{ result.short_name }}</div>
-        </div>
-        <div style="text-align:right">
-          <div style="font-size:24px;font-weight:700">{{ result.currency }}{{ result.latest_price }}</div>
-          <div style="color:#6b7280;font-size:13px">Last updated live</div>
-        </div>
-      </div>
-
-      <div class="grid" style="margin-top:14px">
-        <div class="metric"><strong>Market Cap</strong><div class="val">{{ result.market_cap }}</div></div>
-        <div class="metric"><strong>Beta (vs {{ result.benchmark }})</strong><div class="val">{{ result.beta_display }}</div></div>
-        <div class="metric"><strong>Promoter / Insider Holding</strong><div class="val">{{ result.promoter }}</div></div>
-      </div>
-
-      {% if result.quarterly_profits %}
-        <h3 style="margin-top:14px;margin-bottom:6px">Last 4 Quarters - Net Income</h3>
-        <div class="grid" style="grid-template-columns:repeat(4,1fr)">
-          {% for qlabel, qval in result.quarterly_profits %}
-            <div class="metric"><strong>{{ qlabel }}</strong><div class="val">{{ qval }}</div></div>
-          {% endfor %}
-        </div>
-      {% endif %}
-
-      <img src="data:image/png;base64,{{ result.plot_url }}" alt="Price chart" />
-    {% endif %}
-  </div>
-  {% endif %}
-
-  <!-- Portfolio -->
-  <div class="card">
-    <h3 style="margin:0 0 10px 0">📈 Your Portfolio</h3>
-    {% if portfolio %}
-      <table>
-        <tr><th>Stock</th><th>Qty</th><th>Buy Price</th><th>Current Price</th><th>Current Value</th><th>P/L</th></tr>
-        {% for it in portfolio %}
-          <tr>
-            <td>{{ it.symbol }}</td>
-            <td>{{ it.quantity }}</td>
-            <td>{{ it.currency }}{{ it.buy_price }}</td>
-            <td>{{ it.currency }}{{ it.current_price }}</td>
-            <td>{{ it.currency }}{{ it.current_value }}</td>
-            <td class="{{ 'green' if it.pnl>=0 else 'red' }}">{{ it.currency }}{{ it.pnl }}</td>
-          </tr>
-        {% endfor %}
-      </table>
-    {% else %}
-      <div style="color:#6b7280">Your portfolio is empty. Add holdings using the form above.</div>
-    {% endif %}
-  </div>
-
-</div>
-</body>
-</html>
-"""
-
-# ---------------- Routes ----------------
-@app.route("/", methods=["GET","POST"])
-def home():
-    global portfolio
-    result = None
-    # POST: analyze / add
-    if request.method == "POST":
-        symbol = (request.form.get("custom") or request.form.get("symbol") or "").strip()
-        symbol = symbol.upper()
-        quantity = request.form.get("quantity")
-        price = request.form.get("price")
-
-        # validate
-        if not symbol:
-            result = {"error": "Please provide a ticker (select or type one)."}
-        else:
-            # get history and benchmark
-            stock_hist = get_historical_prices(symbol, days=180)
-            benchmark_symbol = choose_benchmark(symbol)
-            market_hist = get_historical_prices(benchmark_symbol, days=180)
-
-            if stock_hist is None:
-                result = {"error": f"Could not fetch historical data for {symbol}. Check ticker."}
-            else:
-                # align date indexes for beta
-                if market_hist is None:
-                    beta = None
-                else:
-                    common = stock_hist.index.intersection(market_hist.index)
-                    if len(common) < 30:
-                        beta = None
-                    else:
-                        beta = compute_beta(stock_hist.loc[common], market_hist.loc[common])
-
-                # generate chart (last 120 days)
-                try:
-                    buf = io.BytesIO()
-                    plt.figure(figsize=(10,4))
-                    plt.plot(stock_hist.index, stock_hist['close'], linewidth=2)
-                    plt.title(f"{symbol} - Close Price")
-                    plt.grid(alpha=0.25)
-                    plt.tight_layout()
-                    plt.savefig(buf, format="png", dpi=100)
-                    plt.close()
-                    buf.seek(0)
-                    plot_url = base64.b64encode(buf.getvalue()).decode()
-                except Exception:
-                    plot_url = ""
-
-                # get financials & last 4 quarters
-                net_income, quarterly_profits_raw, market_cap_raw, promoter, currency_symbol = get_company_financials(symbol)
-                # format quarterly profits as list of (label, formatted_value) for template
-                quarterly_profits = []
-                for label, val in (quarterly_profits_raw or []):
-                    quarterly_profits.append((label, format_large_number(val, currency_symbol)))
-
-                latest_price = get_latest_price(symbol)
-                latest_price_disp = round(latest_price,2) if latest_price is not None else "N/A"
-
-                # add to portfolio if qty & price provided
-                if quantity and price:
-                    try:
-                        q = int(quantity)
-                        p = float(price)
-                        lp = latest_price if latest_price is not None else p
-                        current_value = round(q * lp, 2)
-                        pnl = round(current_value - (q * p), 2)
-                        portfolio.append({
-                            "symbol": symbol,
-                            "quantity": q,
-                            "buy_price": round(p,2),
-                            "currency": currency_symbol,
-                            # current values will be refreshed below before rendering
-                        })
-                    except Exception:
-                        pass
-
-                result = {
-                    "symbol": symbol,
-                    "short_name": symbol,
-                    "latest_price": latest_price_disp,
-                    "market_cap": format_large_number(market_cap_raw, currency_symbol),
-                    "net_income": format_large_number(net_income, currency_symbol),
-                    "quarterly_profits": quarterly_profits,
-                    "promoter": f"{promoter*100:.2f}% " if promoter is not None else "N/A",
-                    "beta": beta,
-                    "beta_display": f"{beta:.2f}" if beta is not None else "N/A",
-                    "plot_url": plot_url,
-                    "benchmark": benchmark_symbol,
-                    "currency": currency_symbol
-                }
-
-    # refresh portfolio current prices before rendering
-    enriched_portfolio = []
-    for item in portfolio:
-        sym = item['symbol']
-        q = item['quantity']
-        buy = item['buy_price']
-        cur_price = get_latest_price(sym)
-        if cur_price is None:
-            cur_price = 0.0
-        cur_price = round(cur_price,2)
-        cur_value = round(cur_price * q, 2)
-        pnl = round(cur_value - (buy * q), 2)
-        enriched_portfolio.append({
-            "symbol": sym,
-            "quantity": q,
-            "buy_price": buy,
-            "current_price": cur_price,
-            "current_value": cur_value,
-            "pnl": pnl,
-            "currency": get_company_financials(sym)[4]  # currency symbol
-        })
-
-    return render_template_string(html_template, result=result, portfolio=enriched_portfolio, stock_list=STOCK_LIST)
-
-if __name__ == "__main__":
-    print("Server running on http://127.0.0.1:5000/")
-    app.run(debug=True)
+# app.py
+from flask import Flask, request, Response
+from jinja2 import Environment, DictLoader
+import gzip
+import sqlite3
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import io
+import base64
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import matplotlib
+matplotlib.use("Agg")  # headless, thread-safe memory canvas - no GUI backend init per request
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+app = Flask(__name__)
+
+DB_PATH = "portfolio.db"
+
+class Portfolio:
+    """Holdings persisted in SQLite, read back as parallel numpy arrays
+
+    SQLite (in WAL mode for concurrent readers) means the portfolio
+    survives restarts and can be shared by several gunicorn workers;
+    the structure-of-arrays columns keep the P/L refresh as whole-array
+    numpy expressions instead of per-row dict lookups."""
+    def __init__(self, path=DB_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS holdings("
+                           "symbol TEXT, qty INTEGER, buy REAL, currency TEXT)")
+        self._conn.commit()
+        self.reload()
+
+    def reload(self):
+        """Re-read the holdings table (picks up inserts from other workers)"""
+        rows = self._conn.execute("SELECT symbol, qty, buy, currency FROM holdings").fetchall()
+        self.symbols = np.array([r[0] for r in rows], dtype=object)
+        self.quantities = np.array([r[1] for r in rows], dtype=np.int64)
+        self.buy_prices = np.array([r[2] for r in rows], dtype=np.float64)
+        self.currencies = np.array([r[3] for r in rows], dtype=object)
+
+    def __len__(self):
+        return int(self.symbols.size)
+
+    def append(self, symbol, quantity, buy_price, currency):
+        self._conn.execute("INSERT INTO holdings VALUES (?,?,?,?)",
+                           (symbol, int(quantity), float(buy_price), currency))
+        self._conn.commit()
+        self.reload()
+
+    def cache_key(self):
+        """Stable fingerprint of the current holdings (for the render cache)"""
+        return tuple(sorted(zip(self.symbols.tolist(),
+                                self.quantities.tolist(),
+                                self.buy_prices.tolist())))
+
+portfolio = Portfolio()  # SQLite-backed portfolio
+
+# last rendered portfolio rows, reused while the holdings are unchanged
+# and the entry is younger than PRICE_CACHE_TTL - plain GETs cost nothing
+_PORTFOLIO_CACHE = {"key": None, "ts": 0.0, "data": []}
+
+# one reusable figure/canvas pair - avoids pyplot's figure-manager
+# registration and teardown on every chart
+_FIG = Figure(figsize=(10,4))
+_CANVAS = FigureCanvasAgg(_FIG)
+_AX = _FIG.add_subplot(111)
+
+def _render_plot(dates, closes, title):
+    """Draw the close-price chart and return PNG bytes (runs in a plot worker)"""
+    buf = io.BytesIO()
+    _AX.clear()
+    _AX.plot(dates, closes, linewidth=2)
+    _AX.set_title(title)
+    _AX.grid(alpha=0.25)
+    _FIG.tight_layout()
+    _CANVAS.print_png(buf)
+    return buf.getvalue()
+
+# chart rasterization is pure CPU and would otherwise block the request
+# thread under the GIL - run it in worker processes instead
+_PLOT_POOL = ProcessPoolExecutor(max_workers=2)
+
+# Predefined stock list (you can add/remove tickers)
+STOCK_LIST = ["RELIANCE.NS","TARIL.NS","TIL.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS", "ITC.NS", "RELIANCE.NS", "SBIN.NS", "BAJFINANCE.NS", "LT.NS"]
+
+# ----------------- Helpers -----------------
+# one shared HTTP session for every yfinance call - reuses TCP/TLS
+# connections and Yahoo's cookie+crumb instead of renegotiating per call
+try:
+    from curl_cffi import requests as curl_requests
+    SESSION = curl_requests.Session(impersonate="chrome")
+except ImportError:
+    SESSION = None  # yfinance falls back to its own default session
+
+# cache TTLs: results are memoized per (args, time bucket) so repeated requests
+# within a bucket never hit the network again
+PRICE_CACHE_TTL = 30    # seconds - quotes / financials
+HIST_CACHE_TTL = 300    # seconds - daily history moves slowly
+
+# downstream code only ever needs close prices and their dates, so history
+# is carried as two raw numpy arrays instead of a full DataFrame
+Hist = namedtuple("Hist", "dates close")
+
+@lru_cache(maxsize=512)
+def _get_historical_prices_batch_cached(symbols, days, time_bucket):
+    try:
+        df = yf.download(list(symbols), period=f"{days}d", interval="1d",
+                         group_by="ticker", threads=True, progress=False,
+                         session=SESSION)
+        if df.empty:
+            return {}, {}
+        hists = {}
+        closes = {}
+        for sym in symbols:
+            try:
+                # multi-ticker downloads come back with a (ticker, field) column MultiIndex
+                sub = df[sym] if isinstance(df.columns, pd.MultiIndex) else df
+                closes[sym] = sub['Close']
+                close = closes[sym].dropna()
+                if close.empty:
+                    continue
+                hists[sym] = Hist(close.index.values.astype('datetime64[D]'),
+                                  close.to_numpy(dtype=np.float64))
+            except Exception:
+                continue
+        # the download already shares one DatetimeIndex, so an inner join here
+        # yields date-aligned close arrays for free - no per-request alignment
+        aligned = {}
+        if len(closes) > 1:
+            try:
+                joint = pd.DataFrame(closes).dropna()
+                if not joint.empty:
+                    aligned = {sym: joint[sym].to_numpy(dtype=np.float64) for sym in joint.columns}
+            except Exception:
+                aligned = {}
+        return hists, aligned
+    except Exception:
+        return {}, {}
+
+def get_historical_prices_batch(symbols, days=180):
+    """Download daily history for several tickers with one request (yfinance threads the batch)
+
+    Returns {symbol: Hist} for the tickers that came back with data."""
+    return _get_historical_prices_batch_cached(tuple(symbols), days, int(time.time() // HIST_CACHE_TTL))[0]
+
+def get_aligned_closes(symbols, days=180):
+    """Date-aligned close arrays ({symbol: ndarray}) from the same cached batch download"""
+    return _get_historical_prices_batch_cached(tuple(symbols), days, int(time.time() // HIST_CACHE_TTL))[1]
+
+def get_historical_prices(symbol, days=180):
+    """Download daily history (reliable); returns a Hist or None"""
+    return get_historical_prices_batch([symbol], days=days).get(symbol)
+
+def _fast_info_get(fi, key, attr=None):
+    """Read a key from fast_info (a dict in old yfinance, a lazy camelCase
+    mapping in new ones; attr is the snake_case attribute spelling)"""
+    if fi is None:
+        return None
+    try:
+        val = fi.get(key) if hasattr(fi, "get") else fi[key]
+        if val is not None:
+            return val
+    except Exception:
+        pass
+    if attr:
+        try:
+            return getattr(fi, attr, None)
+        except Exception:
+            pass
+    return None
+
+@lru_cache(maxsize=512)
+def _get_latest_price_cached(symbol, time_bucket):
+    try:
+        t = yf.Ticker(symbol, session=SESSION)
+        # fast_info is a lightweight pre-parsed quote - no quoteSummary download
+        last = _fast_info_get(getattr(t, "fast_info", None), "lastPrice", "last_price")
+        if last:
+            return float(last)
+        # fallback: recent close from history (deliberately skip the heavy t.info)
+        hist = t.history(period="5d")
+        if not hist.empty:
+            return float(hist['Close'].dropna().iloc[-1])
+    except Exception:
+        pass
+    return None
+
+def get_latest_price(symbol, prefetched_hist=None):
+    """Try to fetch the most recent market price robustly (cached ~30s)
+
+    If the caller already downloaded daily history, pass it as
+    prefetched_hist (a Hist) - its last close is the latest daily price
+    and we skip the network round-trip entirely."""
+    if prefetched_hist is not None and prefetched_hist.close.size:
+        try:
+            return float(prefetched_hist.close[-1])
+        except Exception:
+            pass
+    return _get_latest_price_cached(symbol, int(time.time() // PRICE_CACHE_TTL))
+
+# Indian exchange suffixes - single hash lookup instead of chained endswith
+_IN_SUFFIXES = frozenset({"NS", "BSE", "BO", "BE"})
+
+def choose_benchmark(symbol):
+    """Pick ^NSEI for Indian (.NS) tickers, otherwise ^GSPC (S&P500)"""
+    # only treat the last token as an exchange suffix if there is a dot -
+    # dotless tickers like BE or NS are US listings
+    return "^NSEI" if "." in symbol and symbol.rsplit(".", 1)[-1].upper() in _IN_SUFFIXES else "^GSPC"
+
+# optional numba kernel for the beta hot loop - a plain numpy fallback below
+# keeps the app working when numba isn't installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    # eager signature compiles at import time so the first request
+    # doesn't pay the JIT warm-up
+    @njit('float64(float64[:], float64[:])', cache=True, fastmath=True)
+    def _beta_jit(s, m):
+        n = s.size - 1
+        ss = 0.0
+        sm = 0.0
+        smm = 0.0
+        ssm = 0.0
+        for i in range(n):
+            rs = (s[i+1] - s[i]) / s[i]
+            rm = (m[i+1] - m[i]) / m[i]
+            ss += rs
+            sm += rm
+            smm += rm * rm
+            ssm += rs * rm
+        inv = 1.0 / n
+        cov = ssm * inv - ss * inv * sm * inv
+        var = smm * inv - (sm * inv) ** 2
+        if var == 0.0:
+            return np.nan
+        return cov / var
+else:
+    _beta_jit = None
+
+def compute_beta(stock_close, market_close):
+    """Beta from two date-aligned close-price arrays"""
+    try:
+        s = np.asarray(stock_close, dtype=np.float64)
+        m = np.asarray(market_close, dtype=np.float64)
+        if (_beta_jit is not None and s.size == m.size and s.size > 10
+                and np.isfinite(s).all() and np.isfinite(m).all()):
+            b = _beta_jit(s, m)
+            return float(b) if np.isfinite(b) else None
+        sr = np.diff(s) / s[:-1]
+        mr = np.diff(m) / m[:-1]
+        mask = np.isfinite(sr) & np.isfinite(mr)
+        sr = sr[mask]
+        mr = mr[mask]
+        if sr.size < 10:
+            return None
+        var_market = mr.var()
+        if var_market == 0:
+            return None
+        cov = (sr * mr).mean() - sr.mean() * mr.mean()
+        return float(cov / var_market)
+    except Exception:
+        return None
+
+def format_large_number(value, currency_symbol=""):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "N/A"
+    try:
+        v = float(value)
+    except Exception:
+        return str(value)
+    # nice units
+    if abs(v) >= 1e12:
+        return f"{currency_symbol}{v/1e12:,.2f} T"
+    if abs(v) >= 1e9:
+        return f"{currency_symbol}{v/1e9:,.2f} B"
+    if abs(v) >= 1e6:
+        return f"{currency_symbol}{v/1e6:,.2f} M"
+    return f"{currency_symbol}{v:,.2f}"
+
+def format_large_numbers(values, currency_symbol=""):
+    """Vectorized format_large_number - one np.select pass over a whole column"""
+    v = np.asarray(values, dtype=np.float64)
+    absv = np.abs(v)
+    conds = [absv >= 1e12, absv >= 1e9, absv >= 1e6]
+    scale = np.select(conds, [1e12, 1e9, 1e6], default=1.0)
+    unit = np.select(conds, [" T", " B", " M"], default="")
+    return [f"{currency_symbol}{x:,.2f}{u}" if np.isfinite(x) else "N/A"
+            for x, u in zip(v / scale, unit)]
+
+@lru_cache(maxsize=512)
+def _get_company_financials_cached(symbol, time_bucket):
+    try:
+        t = yf.Ticker(symbol, session=SESSION)
+        # currency and market cap come straight from fast_info - cheap
+        fi = getattr(t, "fast_info", None)
+        currency = _fast_info_get(fi, "currency") or ""
+        currency_symbol = "₹" if currency == "INR" else ("$" if currency == "USD" else "")
+        market_cap = _fast_info_get(fi, "marketCap", "market_cap")
+        # annual net income (from financials)
+        net_income = None
+        try:
+            fin = t.financials
+            if not fin.empty and "Net Income" in fin.index:
+                net_income = fin.loc["Net Income"].iloc[0]
+        except Exception:
+            net_income = None
+        # quarterly: extract last 4 quarters net income
+        quarterly_profits = []
+        try:
+            qfin = t.quarterly_financials
+            if not qfin.empty and "Net Income" in qfin.index:
+                s = qfin.loc["Net Income"]
+                # take first 4 columns (yfinance usually orders most recent first)
+                items = s.iloc[:4]
+                for idx, val in items.items():
+                    # idx may be Timestamp or str
+                    try:
+                        date_str = pd.to_datetime(idx).strftime("%b %Y")
+                    except Exception:
+                        date_str = str(idx)
+                    quarterly_profits.append((date_str, val))
+        except Exception:
+            pass
+        # insider holding only lives in the heavy quoteSummary endpoint -
+        # fetch it last and tolerate failure (result is cached with the rest)
+        promoter_holding = None
+        try:
+            info = t.get_info()
+            promoter_holding = info.get("heldPercentInsiders")
+            if market_cap is None:
+                market_cap = info.get("marketCap")
+        except Exception:
+            pass
+        return net_income, quarterly_profits, market_cap, promoter_holding, currency_symbol
+    except Exception:
+        return None, [], None, None, ""
+
+def get_company_financials(symbol):
+    """Return (latest_net_income, list_of_last4_quarters [(period_str, value)], market_cap, promoter_pct, currency)
+
+    Cached ~30s per symbol."""
+    return _get_company_financials_cached(symbol, int(time.time() // PRICE_CACHE_TTL))
+
+# ---------------- HTML Template ----------------
+html_template = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Portfolio & Stock Dashboard</title>
+    <meta name="viewport" content="width=device-width,initial-scale=1">
+    <style>
+        :root{--blue:#007bff;--dark:#222}
+        body{font-family:Inter,Arial,Helvetica,sans-serif;background:#f5f7fb;margin:0;padding:20px;display:flex;flex-direction:column;align-items:center}
+        .wrap{width:100%;max-width:1100px}
+        header{display:flex;justify-content:space-between;align-items:center;margin-bottom:16px}
+        h1{margin:0;color:var(--dark)}
+        form{display:flex;gap:8px;flex-wrap:wrap}
+        select,input,button{padding:10px;border-radius:8px;border:1px solid #d6dbe8;font-size:14px}
+        button{background:var(--blue);color:#fff;border:none;cursor:pointer}
+        .card{background:#fff;border-radius:12px;padding:18px;box-shadow:0 6px 18px rgba(30,40,60,0.06);margin-bottom:16px}
+        .grid{display:grid;grid-template-columns:repeat(3,1fr);gap:12px}
+        .metric{background:#fbfdff;padding:12px;border-radius:8px;border:1px solid #eef3fb}
+        .metric strong{display:block;font-size:13px;color:#6b7280}
+        .metric .val{font-size:18px;margin-top:6px;color:#111}
+        table{width:100%;border-collapse:collapse;margin-top:12px}
+        th,td{padding:10px;border-bottom:1px solid #eef1f6;text-align:center}
+        th{background:linear-gradient(90deg,var(--blue),#0056b3);color:#fff}
+        .green{color:green;font-weight:600}
+        .red{color:red;font-weight:600}
+        img{max-width:100%;border-radius:8px;margin-top:12px}
+        @media (max-width:800px){
+            .grid{grid-template-columns:repeat(1,1fr)}
+        }
+    </style>
+</head>
+<body>
+<div class="wrap">
+  <header>
+    <h1>Portfolio & Stock Dashboard</h1>
+  </header>
+
+  <div class="card">
+    <form method="POST" style="align-items:center;">
+      <select name="symbol">
+        {% for s in stock_list %}
+          <option value="{{s}}" {% if result and result.symbol==s %}selected{% endif %}>{{s}}</option>
+        {% endfor %}
+      </select>
+      <input type="text" name="custom" placeholder="Or type custom ticker (e.g. AAPL)" />
+      <input type="number" name="quantity" placeholder="Qty (optional)" min="1" />
+      <input type="number" step="0.01" name="price" placeholder="Buy Price (optional)" />
+      <button type="submit">Analyze / Add</button>
+    </form>
+  </div>
+
+  {% if result %}
+  <div class="card">
+    {% if result.error %}
+      <div style="color:red;font-weight:600">{{ result.error }}</div>
+    {% else %}
+      <div style="display:flex;justify-content:space-between;align-items:center;gap:16px;flex-wrap:wrap">
+        <div>
+          <h2 style="margin:0">{{ result.symbol }}</h2>
+          <div style="margin-top:6px;color:#6b7280">{{ result.short_name }}</div>
+        </div>
+        <div style="text-align:right">
+          <div style="font-size:24px;font-weight:700">{{ result.currency }}{{ result.latest_price }}</div>
+          <div style="color:#6b7280;font-size:13px">Last updated live</div>
+        </div>
+      </div>
+
+      <div class="grid" style="margin-top:14px">
+        <div class="metric"><strong>Market Cap</strong><div class="val">{{ result.market_cap }}</div></div>
+        <div class="metric"><strong>Beta (vs {{ result.benchmark }})</strong><div class="val">{{ result.beta_display }}</div></div>
+        <div class="metric"><strong>Promoter / Insider Holding</strong><div class="val">{{ result.promoter }}</div></div>
+      </div>
+
+      {% if result.quarterly_profits %}
+        <h3 style="margin-top:14px;margin-bottom:6px">Last 4 Quarters - Net Income</h3>
+        <div class="grid" style="grid-template-columns:repeat(4,1fr)">
+          {% for qlabel, qval in result.quarterly_profits %}
+            <div class="metric"><strong>{{ qlabel }}</strong><div class="val">{{ qval }}</div></div>
+          {% endfor %}
+        </div>
+      {% endif %}
+
+      <img src="data:image/png;base64,{{ result.plot_url }}" alt="Price chart" />
+    {% endif %}
+  </div>
+  {% endif %}
+
+  <!-- Portfolio -->
+  <div class="card">
+    <h3 style="margin:0 0 10px 0">📈 Your Portfolio</h3>
+    {% if portfolio %}
+      <table>
+        <tr><th>Stock</th><th>Qty</th><th>Buy Price</th><th>Current Price</th><th>Current Value</th><th>P/L</th></tr>
+        {% for it in portfolio %}
+          <tr>
+            <td>{{ it.symbol }}</td>
+            <td>{{ it.quantity }}</td>
+            <td>{{ it.currency }}{{ it.buy_price }}</td>
+            <td>{{ it.currency }}{{ it.current_price }}</td>
+            <td>{{ it.currency }}{{ it.current_value }}</td>
+            <td class="{{ 'green' if it.pnl>=0 else 'red' }}">{{ it.currency }}{{ it.pnl_display }}</td>
+          </tr>
+        {% endfor %}
+      </table>
+    {% else %}
+      <div style="color:#6b7280">Your portfolio is empty. Add holdings using the form above.</div>
+    {% endif %}
+  </div>
+
+</div>
+</body>
+</html>
+"""
+
+# compile the template once at import - render_template_string would
+# re-parse and re-compile it on every request
+_ENV = Environment(loader=DictLoader({"dash": html_template}), autoescape=True)
+_TPL = _ENV.get_template("dash")
+
+# ---------------- Routes ----------------
+@app.route("/", methods=["GET","POST"])
+def home():
+    result = None
+    # POST: analyze / add
+    if request.method == "POST":
+        symbol = (request.form.get("custom") or request.form.get("symbol") or "").strip()
+        symbol = symbol.upper()
+        quantity = request.form.get("quantity")
+        price = request.form.get("price")
+
+        # validate
+        if not symbol:
+            result = {"error": "Please provide a ticker (select or type one)."}
+        else:
+            # get history and benchmark in a single batched download
+            benchmark_symbol = choose_benchmark(symbol)
+            hist_map = get_historical_prices_batch([symbol, benchmark_symbol], days=180)
+            stock_hist = hist_map.get(symbol)
+            market_hist = hist_map.get(benchmark_symbol)
+
+            if stock_hist is None:
+                result = {"error": f"Could not fetch historical data for {symbol}. Check ticker."}
+            else:
+                # kick the chart off in a plot worker right away - it renders
+                # while we compute beta and fetch financials below
+                plot_future = _PLOT_POOL.submit(_render_plot, stock_hist.dates, stock_hist.close,
+                                                f"{symbol} - Close Price")
+
+                # the batch download already aligned the two close series
+                if market_hist is None:
+                    beta = None
+                else:
+                    aligned = get_aligned_closes([symbol, benchmark_symbol], days=180)
+                    s_close = aligned.get(symbol)
+                    m_close = aligned.get(benchmark_symbol)
+                    if s_close is None or s_close.size < 30:
+                        beta = None
+                    else:
+                        beta = compute_beta(s_close, m_close)
+
+                # get financials & last 4 quarters
+                net_income, quarterly_profits_raw, market_cap_raw, promoter, currency_symbol = get_company_financials(symbol)
+                # format quarterly profits as list of (label, formatted_value) for template
+                quarterly_profits = []
+                for label, val in (quarterly_profits_raw or []):
+                    quarterly_profits.append((label, format_large_number(val, currency_symbol)))
+
+                latest_price = get_latest_price(symbol, prefetched_hist=stock_hist)
+                latest_price_disp = round(latest_price,2) if latest_price is not None else "N/A"
+
+                # collect the chart, now that the overlapping work is done
+                try:
+                    plot_url = base64.b64encode(plot_future.result()).decode()
+                except Exception:
+                    plot_url = ""
+
+                # add to portfolio if qty & price provided
+                if quantity and price:
+                    try:
+                        q = int(quantity)
+                        p = float(price)
+                        # current values are refreshed below before rendering
+                        portfolio.append(symbol, q, round(p,2), currency_symbol)
+                    except Exception:
+                        pass
+
+                result = {
+                    "symbol": symbol,
+                    "short_name": symbol,
+                    "latest_price": latest_price_disp,
+                    "market_cap": format_large_number(market_cap_raw, currency_symbol),
+                    "net_income": format_large_number(net_income, currency_symbol),
+                    "quarterly_profits": quarterly_profits,
+                    "promoter": f"{promoter*100:.2f}% " if promoter is not None else "N/A",
+                    "beta": beta,
+                    "beta_display": f"{beta:.2f}" if beta is not None else "N/A",
+                    "plot_url": plot_url,
+                    "benchmark": benchmark_symbol,
+                    "currency": currency_symbol
+                }
+
+    # refresh portfolio current prices before rendering
+    # reuse the last enriched rows while the holdings haven't changed and
+    # the cache entry is still fresh - GETs then skip the refresh entirely
+    portfolio.reload()  # other workers may have added holdings
+    cache_key = portfolio.cache_key()
+    if cache_key == _PORTFOLIO_CACHE["key"] and time.time() - _PORTFOLIO_CACHE["ts"] < PRICE_CACHE_TTL:
+        enriched_portfolio = _PORTFOLIO_CACHE["data"]
+    else:
+        # fetches are network-bound, so run them in parallel instead of one symbol at a time
+        enriched_portfolio = []
+        if len(portfolio):
+            syms = portfolio.symbols.tolist()
+            with ThreadPoolExecutor(max_workers=min(32, len(syms))) as ex:
+                prices = dict(zip(syms, ex.map(get_latest_price, syms)))
+            # P/L for the whole portfolio in a few whole-array numpy ops
+            cur_prices = np.round(np.array([prices.get(s) or 0.0 for s in syms],
+                                           dtype=np.float64), 2)
+            cur_values = np.round(cur_prices * portfolio.quantities, 2)
+            pnls = np.round(cur_values - portfolio.buy_prices * portfolio.quantities, 2)
+            # format both money columns in one vectorized pass each
+            value_strs = format_large_numbers(cur_values)
+            pnl_strs = format_large_numbers(pnls)
+            for sym, q, buy, cur_price, cur_value, pnl, pnl_disp, currency in zip(
+                    syms, portfolio.quantities.tolist(), portfolio.buy_prices.tolist(),
+                    cur_prices.tolist(), value_strs, pnls.tolist(), pnl_strs,
+                    portfolio.currencies.tolist()):
+                enriched_portfolio.append({
+                    "symbol": sym,
+                    "quantity": q,
+                    "buy_price": buy,
+                    "current_price": cur_price,
+                    "current_value": cur_value,
+                    "pnl": pnl,
+                    "pnl_display": pnl_disp,
+                    "currency": currency  # stored at add time
+                })
+        _PORTFOLIO_CACHE.update(key=cache_key, ts=time.time(), data=enriched_portfolio)
+
+    rendered = _TPL.render(result=result, portfolio=enriched_portfolio, stock_list=STOCK_LIST)
+    # the page carries a base64 PNG, so gzip shrinks it 5-10x on the wire
+    if "gzip" in request.headers.get("Accept-Encoding", "").lower():
+        gz = gzip.compress(rendered.encode(), compresslevel=5)
+        return Response(gz, headers={"Content-Encoding": "gzip",
+                                     "Content-Type": "text/html; charset=utf-8",
+                                     "Vary": "Accept-Encoding"})
+    return rendered
+
+if __name__ == "__main__":
+    print("Server running on http://127.0.0.1:5000/")
+    app.run(debug=True)